@@ -6,12 +6,29 @@ A Flask web application for natural language SQL queries with enterprise-grade s
 import os
 import sqlite3
 import logging
+import logging.handlers
+import queue
 import json
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, stream_with_context
 from groq import Groq
+import orjson
+import httpx
 from dotenv import load_dotenv
 import re
+import atexit
+import functools
+import threading
+import weakref
+import difflib
+
+try:
+    import numpy as np
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
@@ -27,25 +44,51 @@ import codecs
 if sys.platform.startswith('win'):
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-    handlers=[
-        logging.FileHandler('logs/chatbot.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Request threads only enqueue records; a background listener does the file/console I/O
+log_formatter = logging.Formatter('%(asctime)s | %(levelname)-8s | %(name)s | %(message)s')
+file_handler = logging.FileHandler('logs/chatbot.log', encoding='utf-8')
+file_handler.setFormatter(log_formatter)
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setFormatter(log_formatter)
+
+queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+log_listener = None
+
+def start_log_listener():
+    """Start the background log writer on a fresh queue (called again in forked workers)"""
+    global log_listener
+    queue_handler.queue = queue.Queue(-1)
+    log_listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, console_handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+# Registered first so it runs last and flushes records logged by other exit hooks
+start_log_listener()
+
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(queue_handler)
 logger = logging.getLogger('SecureChatbot')
 
-# Initialize Groq client
-try:
+# Groq HTTP connection pool - keep TCP/TLS sessions alive between chat requests
+GROQ_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=60)
+GROQ_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+def create_groq_client():
+    """Create a Groq client backed by a persistent keep-alive HTTP pool"""
     groq_api_key = os.getenv('GROQ_API_KEY')
-    if groq_api_key:
-        groq_client = Groq(api_key=groq_api_key)
-        logger.info("Groq client initialized successfully")
-    else:
+    if not groq_api_key:
         logger.error("GROQ_API_KEY not found in environment variables")
-        groq_client = None
+        return None
+    
+    http_client = httpx.Client(limits=GROQ_HTTP_LIMITS, timeout=GROQ_HTTP_TIMEOUT)
+    client = Groq(api_key=groq_api_key, http_client=http_client)
+    logger.info("Groq client initialized successfully")
+    return client
+
+# Initialize Groq client
+try:
+    groq_client = create_groq_client()
 except Exception as e:
     logger.error(f"Failed to initialize Groq client: {e}")
     groq_client = None
@@ -53,20 +96,445 @@ except Exception as e:
 # Database configuration
 DATABASE_PATH = 'database/secure_chatbot.db'
 
+# Per-connection tuning; journal_mode=WAL is set once at init and persists in the file
+SQLITE_TUNING_PRAGMAS = '''
+    PRAGMA synchronous=NORMAL;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+    PRAGMA temp_store=MEMORY;
+'''
+
+# Rows fetched per fetchmany() call when streaming results
+RESULT_FETCH_SIZE = 1000
+
+# Prepared statements kept per connection; sqlite3 keys them on the SQL text
+SQLITE_STATEMENT_CACHE_SIZE = 512
+
+# Thread-local, long-lived, read-only SQLite connections for the query path.
+# Each connection lives exactly as long as its thread: the holder is only referenced
+# from the thread-local, so it is freed (and the connection closed) when the thread
+# exits, e.g. after every request on Werkzeug's thread-per-request dev server
+_db_local = threading.local()
+
+class _ThreadConnection:
+    """The calling thread's connection and reusable cursor"""
+    
+    def __init__(self):
+        self.conn = sqlite3.connect(
+            f'file:{DATABASE_PATH}?mode=ro',
+            uri=True,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE
+        )
+        self.conn.executescript(SQLITE_TUNING_PRAGMAS)
+        self.cursor = self.conn.cursor()
+        # Runs when the holder is freed, or at interpreter exit for threads still alive
+        weakref.finalize(self, _close_connection, self.conn, os.getpid())
+
+def _close_connection(conn, owner_pid):
+    """Close a pooled connection, unless it was inherited across fork() from another process"""
+    if os.getpid() != owner_pid:
+        return
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+def _thread_connection():
+    """Return this thread's connection holder, opening the connection on first use"""
+    holder = getattr(_db_local, 'holder', None)
+    if holder is None:
+        holder = _ThreadConnection()
+        _db_local.holder = holder
+    return holder
+
+def get_conn():
+    """Return this thread's pooled read-only SQLite connection, opening it on first use"""
+    return _thread_connection().conn
+
+def get_cursor():
+    """Return this thread's reusable cursor on its pooled connection"""
+    return _thread_connection().cursor
+
+def reset_connection_pool():
+    """Forget connections inherited across fork() without touching them"""
+    global _db_local
+    _db_local = threading.local()
+
+# Semantic cache configuration
+SQL_CACHE_INDEX_PATH = 'database/sql_cache.faiss'
+SQL_CACHE_QUERIES_PATH = 'database/sql_cache.json'
+SQL_CACHE_LOCK_PATH = 'database/sql_cache.lock'
+SQL_CACHE_MODEL = 'all-MiniLM-L6-v2'
+SQL_CACHE_THRESHOLD = 0.95
+SQL_LRU_CACHE_SIZE = 1024
+
+# Prompt prefix is byte-identical across requests (schema baked in at startup) so
+# provider-side prompt caching can reuse it; only the question tail varies
+SQL_PROMPT_PREFIX_TEMPLATE = """You are an expert SQL analyst for a business database. Convert natural language questions to precise SQLite SELECT queries.
+
+DATABASE SCHEMA:
+{schema_text}
+
+QUERY GUIDELINES:
+1. Generate ONLY SELECT statements (security requirement)
+2. Use proper SQLite syntax with correct JOINs
+3. Apply appropriate WHERE clauses for filtering
+4. Use aggregate functions (COUNT, SUM, AVG, MAX, MIN) when needed
+5. Include proper GROUP BY and ORDER BY clauses
+6. Handle date comparisons correctly
+7. Return ONLY the SQL query without explanations
+
+"""
+
+SQL_PROMPT_QUESTION_TEMPLATE = """USER QUESTION: {user_question}
+
+SQL QUERY:"""
+
+# Model routing: simple lookups go to the small model, anything analytical to the large one
+SIMPLE_QUERY_MODEL = 'llama-3.1-8b-instant'
+COMPLEX_QUERY_MODEL = 'llama3-70b-8192'
+COMPLEX_QUESTION_MAX_WORDS = 12
+
+_COMPLEX_QUESTION_RE = re.compile(
+    r'\b(join|joined|per|by|group|grouped|average|avg|sum|total|revenue|spent|top|most|least|'
+    r'highest|lowest|best|worst|compare|comparison|trend|monthly|month|year|between|each|ratio|'
+    r'percent|percentage|rank|more than|less than|greater|fewer|without|never|both|along with)\b'
+)
+
+# Loose fallback patterns, used only when Groq is unavailable or fails: they fire on a
+# keyword anywhere in the question, so they are a last resort, not a router.
+# Patterns are in priority order. Every branch is a lookahead anchored at the
+# start of the question, so one match() call tries them in order and m.lastgroup
+# names the first branch that applies
+_CUSTOMERS_LIST = r'(?=.*?(?:all customers|show customers|list customers))'
+_PRODUCTS_LIST = r'(?=.*?(?:all products|show products|list products))'
+
+_FALLBACK_RE = re.compile(
+    r'(?P<customers_active>' + _CUSTOMERS_LIST + r'(?=.*?active))'
+    r'|(?P<customers_all>' + _CUSTOMERS_LIST + r')'
+    r'|(?P<customers_count>(?=.*?(?:count customers|how many customers)))'
+    r'|(?P<orders_all>(?=.*?(?:all orders|show orders|list orders)))'
+    r'|(?P<orders_count>(?=.*?(?:count orders|how many orders)))'
+    r'|(?P<products_electronics>' + _PRODUCTS_LIST + r'(?=.*?electronics))'
+    r'|(?P<products_all>' + _PRODUCTS_LIST + r')'
+    r'|(?P<employees_all>(?=.*?(?:all employees|show employees|list employees)))'
+    r'|(?P<electronics_revenue>(?=.*?revenue)(?=.*?electronics))'
+    r'|(?P<top_customers>(?=.*?\btop\b)(?=.*?customers))',
+    re.DOTALL
+)
+
+_FALLBACK_SQL = {
+    'customers_active': "SELECT * FROM customers WHERE status = 'active'",
+    'customers_all': "SELECT * FROM customers",
+    'customers_count': "SELECT COUNT(*) as customer_count FROM customers",
+    'orders_all': "SELECT * FROM orders ORDER BY order_date DESC",
+    'orders_count': "SELECT COUNT(*) as order_count FROM orders",
+    'products_electronics': "SELECT * FROM products WHERE category = 'Electronics'",
+    'products_all': "SELECT * FROM products",
+    'employees_all': "SELECT * FROM employees WHERE status = 'active'",
+    'electronics_revenue': "SELECT SUM(total_amount) as total_revenue FROM orders WHERE category = 'Electronics'",
+    'top_customers': "SELECT c.name, c.email, SUM(o.total_amount) as total_spent FROM customers c JOIN orders o ON c.id = o.customer_id GROUP BY c.id, c.name, c.email ORDER BY total_spent DESC LIMIT 5",
+}
+
+# Whole questions answered from _FALLBACK_SQL before calling Groq (punctuation ignored)
+_COMMON_QUESTIONS = {
+    'show all customers': 'customers_all',
+    'list all customers': 'customers_all',
+    'show customers': 'customers_all',
+    'list customers': 'customers_all',
+    'show active customers': 'customers_active',
+    'list active customers': 'customers_active',
+    'count customers': 'customers_count',
+    'how many customers are there': 'customers_count',
+    'show all orders': 'orders_all',
+    'list all orders': 'orders_all',
+    'show orders': 'orders_all',
+    'list orders': 'orders_all',
+    'count orders': 'orders_count',
+    'how many orders are there': 'orders_count',
+    'show all products': 'products_all',
+    'list all products': 'products_all',
+    'show products': 'products_all',
+    'list products': 'products_all',
+    'show electronics products': 'products_electronics',
+    'list electronics products': 'products_electronics',
+    'show all employees': 'employees_all',
+    'list all employees': 'employees_all',
+    'show employees': 'employees_all',
+    'list employees': 'employees_all',
+}
+COMMON_QUESTION_CUTOFF = 0.85
+_FILLER_WORDS = frozenset(['a', 'an', 'the', 'all', 'me', 'please', 'of', 'our'])
+
+def _content_words(question):
+    """Words of a question that must also appear in the _COMMON_QUESTIONS entry it matches"""
+    return {word.rstrip('s') for word in _WORD_RE.findall(question)} - _FILLER_WORDS
+
+def match_common_question(question):
+    """Return the _FALLBACK_SQL key for a normalized question that is (nearly) a known whole question"""
+    key = " ".join(_WORD_RE.findall(question))
+    if key in _COMMON_QUESTIONS:
+        return _COMMON_QUESTIONS[key]
+    
+    matches = difflib.get_close_matches(key, _COMMON_QUESTIONS.keys(), n=1, cutoff=COMMON_QUESTION_CUTOFF)
+    # Groq is skipped on a match, so the question may drop filler words or plurals but not add "inactive"
+    if matches and _content_words(key) <= _content_words(matches[0]):
+        return _COMMON_QUESTIONS[matches[0]]
+    return None
+
+def select_model(question):
+    """Pick the Groq model for a normalized question based on its apparent complexity"""
+    if len(question.split()) > COMPLEX_QUESTION_MAX_WORDS or _COMPLEX_QUESTION_RE.search(question):
+        return COMPLEX_QUERY_MODEL
+    return SIMPLE_QUERY_MODEL
+
+# SQL validation rules, compiled once at import
+_WORD_RE = re.compile(r'\w+')
+
+_DANGEROUS_KW = frozenset([
+    'DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE',
+    'EXEC', 'EXECUTE', 'REPLACE', 'MERGE', 'PRAGMA', 'ATTACH', 'DETACH'
+])
+
+_INJECTION_RES = [re.compile(pattern) for pattern in [
+    r';\s*(DROP|DELETE|INSERT|UPDATE)',
+    r'--',
+    r'/\*.*\*/',
+    r'UNION.*SELECT',
+    r'OR.*1\s*=\s*1',
+    r'AND.*1\s*=\s*1'
+]]
+
+def normalize_question(question):
+    """Lowercase and collapse whitespace so trivially different questions share cache entries"""
+    return " ".join(question.lower().split())
+
+_SQL_START_RE = re.compile(r'(SELECT|WITH)\b', re.IGNORECASE)
+
+class _StreamedSQL:
+    """SQL lines collected from a streamed reply, without ``` fences or prose before the query"""
+    
+    def __init__(self):
+        self.sql_lines = []
+        self.in_fence = False
+        self.quote_count = 0
+    
+    def feed_line(self, line):
+        """Add one streamed line; returns True once the statement is complete"""
+        text = line.strip()
+        
+        if text.startswith('```'):
+            if self.in_fence:
+                return True  # closing fence
+            # Anything before the opening fence was prose
+            self.in_fence = True
+            self.sql_lines = []
+            self.quote_count = 0
+            text = text[3:]
+            if text[:3].lower() == 'sql':
+                text = text[3:]
+            text = text.strip()
+        
+        closed = text.endswith('```')
+        if closed:
+            text = text[:-3].rstrip()
+        
+        # Outside a fence, skip lead-in prose until a line starts the query
+        if not self.sql_lines and not self.in_fence and not _SQL_START_RE.match(text):
+            return False
+        
+        if text or self.sql_lines:
+            self.sql_lines.append(text)
+            self.quote_count += text.count("'")
+        
+        # An odd quote count means the ';' belongs to a string literal spanning lines
+        return closed or (text.endswith(';') and self.quote_count % 2 == 0)
+    
+    def sql(self):
+        """The SQL collected so far"""
+        return '\n'.join(self.sql_lines).strip()
+
+def read_sql_from_stream(stream):
+    """Collect SQL from a streamed completion, stopping at the first complete statement"""
+    reply = _StreamedSQL()
+    pending = ''
+    
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        pending += chunk.choices[0].delta.content or ''
+        
+        *complete_lines, pending = pending.split('\n')
+        for line in complete_lines:
+            if reply.feed_line(line):
+                return reply.sql()
+    
+    reply.feed_line(pending)
+    return reply.sql()
+
+class SemanticSQLCache:
+    """Vector cache mapping paraphrased questions to previously generated SQL"""
+    
+    def __init__(self, index_path=SQL_CACHE_INDEX_PATH, queries_path=SQL_CACHE_QUERIES_PATH,
+                 model_name=SQL_CACHE_MODEL, threshold=SQL_CACHE_THRESHOLD):
+        self.index_path = index_path
+        self.queries_path = queries_path
+        self.threshold = threshold
+        self.model = SentenceTransformer(model_name)
+        self.lock = threading.Lock()
+        self.persist = True
+        self.unsaved = 0
+        self.writer_lock = None
+        self.index = None
+        self.sql_queries = []
+        self.load()
+    
+    def load(self):
+        """Restore a persisted index, starting empty if none is usable"""
+        dimension = self.model.get_sentence_embedding_dimension()
+        
+        if os.path.exists(self.index_path) and os.path.exists(self.queries_path):
+            try:
+                index = faiss.read_index(self.index_path)
+                with open(self.queries_path, 'r', encoding='utf-8') as f:
+                    sql_queries = json.load(f)
+                if index.d == dimension and index.ntotal == len(sql_queries):
+                    self.index = index
+                    self.sql_queries = sql_queries
+                    logger.info(f"Semantic SQL cache loaded with {len(sql_queries)} entries")
+                    return
+                logger.warning("Semantic SQL cache on disk is inconsistent, starting empty")
+            except Exception as e:
+                logger.warning(f"Failed to load semantic SQL cache: {e}")
+        
+        self.index = faiss.IndexFlatIP(dimension)
+        self.sql_queries = []
+    
+    def claim_writer(self, lock_path=SQL_CACHE_LOCK_PATH):
+        """Become the one pre-forked worker that saves the index, reloading the latest copy"""
+        import fcntl
+        
+        try:
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            lock_file = open(lock_path, 'w')
+        except OSError as e:
+            logger.warning(f"Semantic SQL cache lock unavailable, not saving from this worker: {e}")
+            self.persist = False
+            return False
+        
+        try:
+            # Held until this worker exits; a replacement worker can then take over
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            self.persist = False
+            return False
+        
+        self.writer_lock = lock_file
+        self.persist = True
+        # A previous writer may have saved entries this fork never saw
+        self.load()
+        self.unsaved = 0
+        return True
+    
+    def embed(self, question):
+        """Embed a question as a normalized float32 row vector (inner product == cosine)"""
+        vector = self.model.encode([question], normalize_embeddings=True)
+        return np.asarray(vector, dtype='float32')
+    
+    def lookup(self, question):
+        """Return (embedding, cached SQL or None) for the closest stored question"""
+        vector = self.embed(question)
+        
+        with self.lock:
+            if self.index.ntotal == 0:
+                return vector, None
+            scores, ids = self.index.search(vector, 1)
+        
+        if ids[0][0] >= 0 and scores[0][0] >= self.threshold:
+            return vector, self.sql_queries[ids[0][0]]
+        return vector, None
+    
+    def add(self, vector, sql_query):
+        """Store generated SQL under an embedding returned by lookup()"""
+        with self.lock:
+            self.index.add(vector)
+            self.sql_queries.append(sql_query)
+            self.unsaved += 1
+    
+    def save(self):
+        """Persist the index and its parallel SQL list"""
+        if not self.persist:
+            return
+        with self.lock:
+            # Also keeps a gunicorn master, which never adds, from overwriting its workers' saves
+            if self.index is None or self.unsaved == 0:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+                faiss.write_index(self.index, self.index_path)
+                with open(self.queries_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.sql_queries, f)
+                self.unsaved = 0
+                logger.info(f"Semantic SQL cache saved with {len(self.sql_queries)} entries")
+            except Exception as e:
+                logger.error(f"Failed to save semantic SQL cache: {e}")
+
+# Initialize semantic SQL cache (optional dependencies)
+semantic_cache = None
+if SEMANTIC_CACHE_AVAILABLE:
+    try:
+        semantic_cache = SemanticSQLCache()
+        atexit.register(semantic_cache.save)
+        logger.info("Semantic SQL cache initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize semantic SQL cache: {e}")
+else:
+    logger.info("Semantic SQL cache disabled (sentence-transformers/faiss not installed)")
+
+class InvalidGeneratedSQL(ValueError):
+    """Groq reply that failed validation; raised so the LRU cache does not keep it"""
+    
+    def __init__(self, sql_query, message):
+        super().__init__(message)
+        self.sql_query = sql_query
+
 class SecureLocalChatbot:
     """Professional SQL Chatbot with enterprise security features"""
     
     def __init__(self):
         self.init_database()
+        
+        # Schema is static after init - read and format it once instead of on every request
+        self._schema_info = self.get_database_schema()
+        self._schema_text = self.format_schema_for_ai(self._schema_info)
+        self._prompt_prefix = SQL_PROMPT_PREFIX_TEMPLATE.format(schema_text=self._schema_text)
+        
+        # Exact-match caches keyed on the normalized question
+        self._cached_groq_sql = functools.lru_cache(maxsize=SQL_LRU_CACHE_SIZE)(self._generate_sql_with_groq)
+        self._cached_common_sql = functools.lru_cache(maxsize=SQL_LRU_CACHE_SIZE)(self._match_common_sql)
+        self._cached_fallback_sql = functools.lru_cache(maxsize=SQL_LRU_CACHE_SIZE)(self._match_fallback_sql)
+        
         logger.info("SecureLocalChatbot initialized successfully")
     
+    @property
+    def schema_info(self):
+        """Schema captured at startup (no database round trip)"""
+        return self._schema_info
+    
     def init_database(self):
         """Initialize SQLite database with professional schema"""
         os.makedirs('database', exist_ok=True)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
         cursor = conn.cursor()
         
+        # Tune journaling and caching before any DDL
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.executescript(SQLITE_TUNING_PRAGMAS)
+        
         # Enable foreign key constraints
         cursor.execute("PRAGMA foreign_keys = ON")
         
@@ -136,9 +604,24 @@ class SecureLocalChatbot:
         # Check if data exists and insert samples
         cursor.execute("SELECT COUNT(*) FROM customers")
         if cursor.fetchone()[0] == 0:
-            self.insert_comprehensive_sample_data(cursor)
+            # One explicit transaction for all sample inserts
+            cursor.execute("BEGIN")
+            try:
+                self.insert_comprehensive_sample_data(cursor)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        
+        # Indexes for the columns generated queries filter and join on
+        cursor.executescript('''
+            CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
+            CREATE INDEX IF NOT EXISTS idx_orders_category ON orders(category);
+            CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+            CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status);
+            CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+        ''')
         
-        conn.commit()
         conn.close()
         logger.info("Database initialized successfully")
     
@@ -220,8 +703,7 @@ class SecureLocalChatbot:
     
     def get_database_schema(self):
         """Get detailed database schema with relationships"""
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        cursor = get_cursor()
         
         schema_info = {}
         
@@ -261,7 +743,6 @@ class SecureLocalChatbot:
                 ]
             }
         
-        conn.close()
         return schema_info
     
     def validate_sql_query(self, query):
@@ -275,54 +756,51 @@ class SecureLocalChatbot:
         if not query_upper.startswith('SELECT'):
             return False, "Security: Only SELECT queries are allowed"
         
-        # Enhanced dangerous keyword detection
-        dangerous_keywords = [
-            'DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE',
-            'EXEC', 'EXECUTE', 'REPLACE', 'MERGE', 'PRAGMA', 'ATTACH', 'DETACH'
-        ]
-        
-        for keyword in dangerous_keywords:
-            if f' {keyword} ' in f' {query_upper} ' or query_upper.startswith(f'{keyword} '):
-                return False, f"Forbidden keyword detected: {keyword}"
+        # Enhanced dangerous keyword detection (single tokenizing pass, stops at first hit)
+        forbidden = next(
+            (match.group() for match in _WORD_RE.finditer(query_upper) if match.group() in _DANGEROUS_KW),
+            None
+        )
+        if forbidden:
+            return False, f"Forbidden keyword detected: {forbidden}"
         
         # Check for potential SQL injection patterns
-        injection_patterns = [
-            r';\s*(DROP|DELETE|INSERT|UPDATE)',
-            r'--',
-            r'/\*.*\*/',
-            r'UNION.*SELECT',
-            r'OR.*1\s*=\s*1',
-            r'AND.*1\s*=\s*1'
-        ]
-        
-        for pattern in injection_patterns:
-            if re.search(pattern, query_upper):
-                return False, "Potential SQL injection detected"
+        if any(pattern.search(query_upper) for pattern in _INJECTION_RES):
+            return False, "Potential SQL injection detected"
         
         return True, "Query passed security validation"
     
     def execute_query(self, sql_query):
         """Execute SQL query with enhanced error handling"""
+        success, results = self.execute_query_stream(sql_query)
+        if not success:
+            return False, results
+        
+        columns, row_chunks = results
+        try:
+            rows = [row for chunk in row_chunks for row in chunk]
+            return True, {'columns': columns, 'rows': rows}
+        
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            return False, f"Database error: {str(e)}"
+    
+    def execute_query_stream(self, sql_query):
+        """Execute SQL query, returning its columns and a lazy iterator of row chunks"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            cursor = get_cursor()
+            cursor.arraysize = RESULT_FETCH_SIZE
             
             cursor.execute(sql_query)
-            results = cursor.fetchall()
             
-            # Convert to list of dictionaries with proper formatting
-            data = []
-            for row in results:
-                row_dict = dict(row)
-                # Format decimal values
-                for key, value in row_dict.items():
-                    if isinstance(value, float) and '.' in str(value):
-                        row_dict[key] = round(value, 2)
-                data.append(row_dict)
+            # Columnar payload: column names once, rows as plain tuples (rounding happens in the UI)
+            columns = [description[0] for description in cursor.description]
+            
+            def row_chunks():
+                while chunk := cursor.fetchmany():
+                    yield chunk
             
-            conn.close()
-            return True, data
+            return True, (columns, row_chunks())
         
         except sqlite3.Error as e:
             logger.error(f"Database error: {str(e)}")
@@ -332,92 +810,98 @@ class SecureLocalChatbot:
             return False, f"Unexpected error: {str(e)}"
     
     def generate_sql_from_natural_language(self, user_question):
-        """Generate SQL using Groq with enhanced prompting"""
+        """Generate SQL from built-in patterns, falling back to Groq with enhanced prompting"""
+        normalized_question = normalize_question(user_question)
+        
+        # Questions that are, as a whole, one of the common ones skip the LLM round trip
+        sql_query = self._cached_common_sql(normalized_question)
+        if sql_query:
+            logger.info(f"Common question matched: {normalized_question}")
+            return sql_query
+        
         if not groq_client:
             logger.error("Groq client not initialized")
-            return self.generate_fallback_sql(user_question)
+            return self.generate_fallback_sql(normalized_question)
         
         try:
-            schema_info = self.get_database_schema()
-            schema_text = self.format_schema_for_ai(schema_info)
-            
-            enhanced_prompt = f"""You are an expert SQL analyst for a business database. Convert natural language questions to precise SQLite SELECT queries.
-
-DATABASE SCHEMA:
-{schema_text}
-
-QUERY GUIDELINES:
-1. Generate ONLY SELECT statements (security requirement)
-2. Use proper SQLite syntax with correct JOINs
-3. Apply appropriate WHERE clauses for filtering
-4. Use aggregate functions (COUNT, SUM, AVG, MAX, MIN) when needed
-5. Include proper GROUP BY and ORDER BY clauses
-6. Handle date comparisons correctly
-7. Return ONLY the SQL query without explanations
-
-USER QUESTION: {user_question}
-
-SQL QUERY:"""
-
-            logger.info(f"Sending request to Groq for: {user_question}")
-            
-            response = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=[{"role": "user", "content": enhanced_prompt}],
-                temperature=0.1,
-                max_tokens=600
-            )
-            
-            sql_query = response.choices[0].message.content.strip()
-            
-            # Clean up response formatting
-            sql_query = re.sub(r'^```sql\n?', '', sql_query)
-            sql_query = re.sub(r'\n?```$', '', sql_query)
-            sql_query = sql_query.strip()
-            
-            logger.info(f"Generated SQL: {sql_query}")
-            return sql_query
+            # Failed calls and invalid SQL raise, so they are never stored in the LRU cache
+            return self._cached_groq_sql(normalized_question)
+        
+        except InvalidGeneratedSQL as e:
+            # Returned uncached so /chat reports the validation error with the SQL
+            logger.warning(f"Generated SQL failed validation: {e}")
+            return e.sql_query
         
         except Exception as e:
             logger.error(f"Groq API error: {str(e)}")
             logger.error(f"Error type: {type(e).__name__}")
-            return self.generate_fallback_sql(user_question)
+            return self.generate_fallback_sql(normalized_question)
     
-    def generate_fallback_sql(self, user_question):
-        """Generate basic SQL for common queries when Groq is unavailable"""
-        question_lower = user_question.lower()
+    def _generate_sql_with_groq(self, user_question):
+        """Semantic cache lookup, then Groq completion; raises on API failure"""
+        query_vector = None
+        if semantic_cache:
+            query_vector, cached_sql = semantic_cache.lookup(user_question)
+            if cached_sql:
+                logger.info(f"Semantic cache hit for: {user_question}")
+                return cached_sql
         
-        # Simple pattern matching for basic queries
-        if any(keyword in question_lower for keyword in ['all customers', 'show customers', 'list customers']):
-            if 'active' in question_lower:
-                return "SELECT * FROM customers WHERE status = 'active'"
-            return "SELECT * FROM customers"
+        enhanced_prompt = self._prompt_prefix + SQL_PROMPT_QUESTION_TEMPLATE.format(user_question=user_question)
+        model = select_model(user_question)
         
-        elif any(keyword in question_lower for keyword in ['count customers', 'how many customers']):
-            return "SELECT COUNT(*) as customer_count FROM customers"
+        logger.info(f"Sending request to Groq ({model}) for: {user_question}")
         
-        elif any(keyword in question_lower for keyword in ['all orders', 'show orders', 'list orders']):
-            return "SELECT * FROM orders ORDER BY order_date DESC"
+        stream = groq_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": enhanced_prompt}],
+            temperature=0.1,
+            max_tokens=600,
+            stream=True
+        )
         
-        elif any(keyword in question_lower for keyword in ['count orders', 'how many orders']):
-            return "SELECT COUNT(*) as order_count FROM orders"
+        # Strip fences as lines arrive and abandon the stream once the statement is complete
+        try:
+            sql_query = read_sql_from_stream(stream)
+        finally:
+            stream.close()
         
-        elif any(keyword in question_lower for keyword in ['all products', 'show products', 'list products']):
-            if 'electronics' in question_lower:
-                return "SELECT * FROM products WHERE category = 'Electronics'"
-            return "SELECT * FROM products"
+        if not sql_query:
+            raise ValueError("Groq returned an empty response")
         
-        elif any(keyword in question_lower for keyword in ['all employees', 'show employees', 'list employees']):
-            return "SELECT * FROM employees WHERE status = 'active'"
+        # Invalid replies raise, so neither cache keeps them and the next ask retries Groq
+        is_valid, validation_message = self.validate_sql_query(sql_query)
+        if not is_valid:
+            raise InvalidGeneratedSQL(sql_query, validation_message)
         
-        elif 'revenue' in question_lower and 'electronics' in question_lower:
-            return "SELECT SUM(total_amount) as total_revenue FROM orders WHERE category = 'Electronics'"
+        if semantic_cache and query_vector is not None:
+            semantic_cache.add(query_vector, sql_query)
         
-        elif 'top' in question_lower and 'customers' in question_lower:
-            return "SELECT c.name, c.email, SUM(o.total_amount) as total_spent FROM customers c JOIN orders o ON c.id = o.customer_id GROUP BY c.id, c.name, c.email ORDER BY total_spent DESC LIMIT 5"
+        logger.info(f"Generated SQL: {sql_query}")
+        return sql_query
+    
+    def _match_common_sql(self, user_question):
+        """SQL for a normalized question that fully matches a common question, else None"""
+        key = match_common_question(user_question)
+        return _FALLBACK_SQL[key] if key else None
+    
+    def generate_fallback_sql(self, user_question):
+        """Generate basic SQL for common queries when Groq is unavailable (keyword match, last resort)"""
+        sql_query = self._cached_fallback_sql(normalize_question(user_question))
+        if sql_query:
+            logger.info(f"Fallback pattern matched for: {user_question}")
+        else:
+            logger.warning(f"No fallback SQL pattern matched for: {user_question}")
+        return sql_query
+    
+    def _match_fallback_sql(self, user_question):
+        """Pattern-match a normalized question against the built-in fallback queries"""
+        question_lower = user_question.lower()
+        
+        # Single compiled pass over all patterns (see _FALLBACK_RE)
+        match = _FALLBACK_RE.match(question_lower)
+        if match:
+            return _FALLBACK_SQL[match.lastgroup]
         
-        # Default fallback
-        logger.warning(f"No fallback SQL pattern matched for: {user_question}")
         return None
     
     def format_schema_for_ai(self, schema_info):
@@ -450,6 +934,32 @@ SQL QUERY:"""
 # Initialize the secure chatbot
 chatbot = SecureLocalChatbot()
 
+# Schema caches, compiled regexes and the semantic index are shared copy-on-write
+# with pre-forked workers; SQLite handles, TLS sockets and threads are not
+def reinit_after_fork():
+    """Rebuild per-process resources in a pre-forked worker (see gunicorn_conf.py)"""
+    global groq_client
+    
+    start_log_listener()
+    reset_connection_pool()
+    
+    try:
+        groq_client = create_groq_client()
+    except Exception as e:
+        logger.error(f"Failed to initialize Groq client: {e}")
+        groq_client = None
+    
+    # Every worker adds to its own copy of the index; only one of them saves it,
+    # so entries added by the other workers last until they exit
+    if semantic_cache and semantic_cache.claim_writer():
+        logger.info(f"Worker {os.getpid()} saves the semantic SQL cache")
+    
+    logger.info(f"Worker {os.getpid()} initialized")
+
+def ojsonify(obj, status=200):
+    """jsonify() replacement serializing with orjson (handles datetimes natively)"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
 # 🌐 FLASK ROUTES
 @app.route('/')
 def index():
@@ -460,25 +970,52 @@ def index():
 def get_schema():
     """API endpoint for database schema information"""
     try:
-        schema = chatbot.get_database_schema()
-        return jsonify({
+        schema = chatbot.schema_info
+        return ojsonify({
             'success': True,
             'schema': schema,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         })
     except Exception as e:
         logger.error(f"Schema endpoint error: {str(e)}")
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
+
+def stream_chat_results(sql_query, columns, row_chunks):
+    """Yield a successful /chat payload as JSON, encoding rows one fetch chunk at a time"""
+    yield (b'{"generated_sql":' + orjson.dumps(sql_query)
+           + b',"results":{"columns":' + orjson.dumps(columns) + b',"rows":[')
+    
+    result_count = 0
+    tail = {}
+    try:
+        for chunk in row_chunks:
+            rows = b',\n'.join(orjson.dumps(row) for row in chunk)
+            yield (b',\n' if result_count else b'\n') + rows
+            result_count += len(chunk)
+        
+        tail['success'] = True
+        tail['message'] = f"Found {result_count} result(s)"
+        logger.info(f"Query executed successfully: {sql_query} | Results: {result_count}")
+    except Exception as e:
+        # Headers are already sent; report the failure inside the payload
+        logger.error(f"Result streaming error: {str(e)}")
+        tail['success'] = False
+        tail['error'] = f"Database error: {str(e)}"
+    
+    tail['result_count'] = result_count
+    tail['timestamp'] = datetime.now()
+    # Status fields go last so a mid-stream failure can still be reported
+    yield b'\n]},' + orjson.dumps(tail)[1:]
 
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return ojsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': datetime.now(),
         'groq_connected': groq_client is not None
     })
 
@@ -488,18 +1025,18 @@ def chat():
     try:
         data = request.get_json()
         if not data:
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': 'Invalid JSON data'
-            }), 400
+            }, 400)
         
         user_message = data.get('message', '').strip()
         
         if not user_message:
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': 'Message cannot be empty'
-            }), 400
+            }, 400)
         
         logger.info(f"Processing query: {user_message}")
         
@@ -513,7 +1050,7 @@ def chat():
             else:
                 error_message += " Please try rephrasing your question."
             
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': error_message,
                 'suggestion': 'Try asking: "Show all customers" or "How many orders were placed?"'
@@ -523,41 +1060,35 @@ def chat():
         is_valid, validation_message = chatbot.validate_sql_query(sql_query)
         
         if not is_valid:
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': validation_message,
                 'generated_sql': sql_query
             })
         
         # Execute query
-        success, results = chatbot.execute_query(sql_query)
+        success, results = chatbot.execute_query_stream(sql_query)
         
         if not success:
-            return jsonify({
+            return ojsonify({
                 'success': False,
                 'error': results,
                 'generated_sql': sql_query
             })
         
-        # Format successful response
-        response_data = {
-            'success': True,
-            'message': f"Found {len(results)} result(s)",
-            'generated_sql': sql_query,
-            'results': results,
-            'result_count': len(results),
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        logger.info(f"Query executed successfully: {sql_query} | Results: {len(results)}")
-        return jsonify(response_data)
+        # Stream the successful response so large result sets never sit fully in memory
+        columns, row_chunks = results
+        return app.response_class(
+            stream_with_context(stream_chat_results(sql_query, columns, row_chunks)),
+            mimetype='application/json'
+        )
     
     except Exception as e:
         logger.error(f"Chat endpoint error: {str(e)}")
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': f'Server error: {str(e)}'
-        }), 500
+        }, 500)
 
 if __name__ == '__main__':
     # Ensure required directories exist
@@ -568,7 +1099,7 @@ if __name__ == '__main__':
     logger.info("="*60)
     logger.info("Security Features: SQL Injection Protection, SELECT-only queries")
     logger.info("Database: SQLite with 4 tables (customers, orders, products, employees)")
-    logger.info("AI: Groq LLM (llama3-70b-8192)")
+    logger.info(f"AI: Groq LLM ({SIMPLE_QUERY_MODEL} for simple, {COMPLEX_QUERY_MODEL} for complex queries)")
     logger.info("="*60)
     
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,23 @@
+"""
+🚀 Secure Local SQL Chatbot - Gunicorn Configuration
+Multi-worker production deployment: gunicorn -c gunicorn_conf.py app:app
+"""
+
+import multiprocessing
+
+bind = '0.0.0.0:5000'
+
+# Workers are forked after app.py is imported, so the chatbot's schema cache,
+# compiled patterns and semantic index are built once and shared copy-on-write
+preload_app = True
+workers = 2 * multiprocessing.cpu_count() + 1
+worker_class = 'gthread'
+threads = 4
+
+# Groq calls can take several seconds
+timeout = 60
+
+def post_fork(server, worker):
+    """Recreate resources that are not fork-safe (SQLite pool, Groq client, log writer)"""
+    import app as chatbot_app
+    chatbot_app.reinit_after_fork()
@@ -5,13 +5,28 @@ A professional Flask web application for natural language SQL queries
 
 import os
 import sqlite3
+import importlib.util
 import logging
+import logging.handlers
 import json
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request
+import orjson
+import httpx
 from groq import Groq
 from dotenv import load_dotenv
 import re
+import time
+import queue
+import atexit
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import OrderedDict
+from functools import lru_cache
+import difflib
+import sqlglot
+from sqlglot import exp
+from sqlglot.tokens import TokenType
 
 # Load environment variables
 load_dotenv()
@@ -19,27 +34,323 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'secure-chatbot-key-2025')
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/chatbot.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging: request threads only enqueue records, a background listener writes them
+log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S')
+file_handler = logging.FileHandler('logs/chatbot.log')
+file_handler.setFormatter(log_formatter)
+console_handler = logging.StreamHandler()
+console_handler.setFormatter(log_formatter)
+
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+log_listener.start()
+# Writes out whatever is still queued when the server shuts down
+atexit.register(log_listener.stop)
+
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
 logger = logging.getLogger(__name__)
 
+# Persistent HTTP pool for Groq calls (HTTP/2 only when the optional h2 package is installed)
+GROQ_HTTP2 = importlib.util.find_spec('h2') is not None
+GROQ_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, keepalive_expiry=60)
+GROQ_HTTP_TIMEOUT = 30.0
+
+def create_http_client():
+    """Create a keep-alive HTTP client with connection retries for the Groq API"""
+    transport = httpx.HTTPTransport(retries=2, http2=GROQ_HTTP2, limits=GROQ_HTTP_LIMITS)
+    return httpx.Client(transport=transport, timeout=GROQ_HTTP_TIMEOUT)
+
 # Initialize Groq client
-groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'), http_client=create_http_client())
 
 # Database configuration
 DATABASE_PATH = 'database/chatbot.db'
 
+# Thread-local persistent connections (SQLite handles are per-thread). Only the
+# thread-local refers to each holder, so its connection is closed when the thread
+# exits, e.g. after every request on the development server's thread-per-request model
+_tls = threading.local()
+
+class _ThreadConnection:
+    """The calling thread's persistent database connection"""
+    
+    def __init__(self):
+        self.conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-20000")
+        # The holder lives in _tls, so the connection closes once its request thread ends
+        weakref.finalize(self, self.conn.close)
+
+def _get_conn():
+    """Get this thread's persistent database connection, opening it on first use"""
+    holder = getattr(_tls, 'holder', None)
+    if holder is None:
+        holder = _ThreadConnection()
+        _tls.holder = holder
+    return holder.conn
+
+# Rows fetched per round trip when reading query results
+RESULT_FETCH_SIZE = 1000
+
+# Hard cap on rows returned by a single query
+MAX_RESULT_ROWS = 1000
+
+# AST node types that must never appear in a user query
+FORBIDDEN_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Drop, exp.Create, exp.Alter,
+    exp.TruncateTable, exp.Merge, exp.Command, exp.Pragma, exp.Attach, exp.Detach
+)
+
+# Generated SQL cache (LRU keyed by normalized question)
+SQL_CACHE_SIZE = 256
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_question(question):
+    """Normalize a user question into a cache key"""
+    return _WHITESPACE_RE.sub(' ', question.strip().lower())
+
+# Canonical SQL for common questions, answered without calling Groq
+SQL_TEMPLATES = {
+    'show all customers': "SELECT * FROM customers",
+    'list customers': "SELECT * FROM customers",
+    'show active customers': "SELECT * FROM customers WHERE status = 'active'",
+    'count customers': "SELECT COUNT(*) AS customer_count FROM customers",
+    'show all orders': "SELECT * FROM orders ORDER BY order_date DESC",
+    'list orders': "SELECT * FROM orders ORDER BY order_date DESC",
+    'count orders': "SELECT COUNT(*) AS order_count FROM orders",
+    'count total orders': "SELECT COUNT(*) AS order_count FROM orders",
+    'show pending orders': "SELECT * FROM orders WHERE status = 'pending'",
+    'show all products': "SELECT * FROM products",
+    'list products': "SELECT * FROM products",
+    'count products': "SELECT COUNT(*) AS product_count FROM products",
+    'list products in electronics category': "SELECT * FROM products WHERE category = 'Electronics'",
+}
+SQL_TEMPLATE_CUTOFF = 0.85
+_WORD_RE = re.compile(r'\w+')
+_FILLER_WORDS = frozenset(['a', 'an', 'the', 'all', 'me', 'please', 'of'])
+
+def _content_words(question):
+    """Words of a cache key, minus filler and plural 's', for comparing it with a template key"""
+    return {word.rstrip('s') for word in _WORD_RE.findall(question)} - _FILLER_WORDS
+
+def match_sql_template(question):
+    """Return template SQL for a normalized question that (nearly) matches a known one"""
+    sql_query = SQL_TEMPLATES.get(question)
+    if sql_query is not None:
+        return sql_query
+    
+    matches = difflib.get_close_matches(question, SQL_TEMPLATES.keys(), n=1, cutoff=SQL_TEMPLATE_CUTOFF)
+    # Templates answer ahead of the LRU cache and Groq, so a question with an extra word
+    # such as "pending" must not borrow the SQL of the template without it
+    if matches and _content_words(question) <= _content_words(matches[0]):
+        return SQL_TEMPLATES[matches[0]]
+    return None
+
+# Stable system prompt (rules + schema) so Groq can cache the prefix
+SYSTEM_PROMPT_TEMPLATE = """You are a SQL expert. Convert the user's natural language question to a SQL SELECT query.
+
+Database Schema:
+{schema_text}
+
+Important Rules:
+1. ONLY generate SELECT statements
+2. Use proper SQL syntax for SQLite
+3. Return ONLY the SQL query, no explanations
+4. Use appropriate JOINs when needed
+5. Handle aggregations correctly"""
+
+# Groq only caches prompt prefixes of at least this many tokens
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+def usage_field(obj, name):
+    """Read a field from an SDK model or a plain dict (groq 0.4.1 leaves untyped extras as dicts)"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+# Markdown fence cleanup for model responses
+_FENCE_PREFIX = re.compile(r'^```(?:sql)?\s*', re.IGNORECASE)
+_FENCE_SUFFIX = re.compile(r'\s*```$')
+
+def clean_sql_response(sql_query):
+    """Strip whitespace and markdown fences from a model response"""
+    sql_query = sql_query.strip()
+    # Regexes only run when a fence is present
+    if sql_query.startswith('```'):
+        sql_query = _FENCE_PREFIX.sub('', sql_query)
+        sql_query = _FENCE_SUFFIX.sub('', sql_query)
+        sql_query = sql_query.strip()
+    return sql_query
+
+# Micro-batching of concurrent SQL generation requests
+BATCH_WINDOW_SECONDS = 0.2
+BATCH_MAX_SIZE = 8
+BATCH_TIMEOUT_SECONDS = 5
+_NUMBERED_LINE_RE = re.compile(r'^\s*(\d+)[.)]\s*(.*)$')
+_FENCE_LINE_RE = re.compile(r'^\s*```(?:sql)?\s*$', re.IGNORECASE)
+
+BATCH_PROMPT_PREFIX = (
+    "Convert each of the following questions to a SQL query, numbered 1..{count}. "
+    "Reply with the numbered SQL queries only, one per question, in the same order:\n"
+)
+
+def parse_numbered_replies(text, count):
+    """Split a numbered batch reply into one SQL string per question (None if missing)"""
+    replies = {}
+    current = None
+    for line in text.splitlines():
+        # A fence around the whole reply would otherwise end up in the last query
+        if _FENCE_LINE_RE.match(line):
+            continue
+        match = _NUMBERED_LINE_RE.match(line)
+        if match:
+            number = int(match.group(1))
+            current = number if 1 <= number <= count else None
+            if current is not None:
+                replies[current] = [match.group(2)]
+        elif current is not None:
+            replies[current].append(line)
+    
+    results = []
+    for number in range(1, count + 1):
+        sql_query = clean_sql_response('\n'.join(replies.get(number, '')))
+        results.append(sql_query or None)
+    return results
+
+def apply_row_limit(sql_query):
+    """Append a LIMIT to queries that have none (one extra row is fetched to detect truncation)"""
+    statements = parse_sql(sql_query.strip())
+    if not statements or len(statements) != 1:
+        return sql_query
+    
+    tree = statements[0]
+    if not isinstance(tree, (exp.Select, exp.SetOperation)) or tree.args.get('limit'):
+        return sql_query
+    # The AST only decides; the validated text itself is executed so result column
+    # labels match generated_sql. Cut after the last real token to drop a trailing ';'
+    # or comment (tokens never start inside strings or comments)
+    tokens = [token for token in sqlglot.tokenize(sql_query, read='sqlite') if token.token_type != TokenType.SEMICOLON]
+    return f"{sql_query[:tokens[-1].end + 1]} LIMIT {MAX_RESULT_ROWS + 1}"
+
+class SQLBatcher:
+    """Coalesce concurrent SQL generation requests into batched Groq calls"""
+    
+    def __init__(self, chatbot):
+        self.chatbot = chatbot
+        self._queue = queue.Queue()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sql-batch')
+        self._worker = threading.Thread(target=self._collect, name='sql-batcher', daemon=True)
+        self._worker.start()
+    
+    def submit(self, user_question):
+        """Queue a question and return a Future resolving to its SQL"""
+        future = Future()
+        self._queue.put((user_question, future))
+        return future
+    
+    def _collect(self):
+        """Dispatch requests at once when idle; under concurrency gather up to BATCH_WINDOW_SECONDS or BATCH_MAX_SIZE items"""
+        while True:
+            batch = [self._queue.get()]
+            
+            # Whatever is already queued joins this batch without waiting
+            while len(batch) < BATCH_MAX_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # Only wait for more while another Groq call is running (real concurrency);
+            # a lone request on an idle batcher goes out immediately
+            with self._in_flight_lock:
+                busy = self._in_flight > 0
+            if busy:
+                deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+                while len(batch) < BATCH_MAX_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            
+            with self._in_flight_lock:
+                self._in_flight += 1
+            self._executor.submit(self._process, batch)
+    
+    def _process(self, batch):
+        """Resolve a batch and mark it finished"""
+        try:
+            self._resolve(batch)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+    
+    def _resolve(self, batch):
+        """Resolve a batch, using a per-request call when only one item is queued"""
+        questions = [question for question, _ in batch]
+        try:
+            if len(batch) == 1:
+                results = [self.chatbot.request_sql(questions[0])]
+            else:
+                logger.info(f"Batching {len(batch)} questions into one Groq call")
+                results = self.chatbot.request_sql_batch(questions)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for (question, future), sql_query in zip(batch, results):
+            if sql_query is None:
+                # Reply was missing from the batch; retry this one on its own
+                try:
+                    sql_query = self.chatbot.request_sql(question)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+            future.set_result(sql_query)
+
+@lru_cache(maxsize=512)
+def parse_sql(sql_query):
+    """Parse SQL into sqlglot statement trees, or None if it does not parse"""
+    try:
+        return tuple(tree for tree in sqlglot.parse(sql_query, read='sqlite') if tree is not None)
+    except sqlglot.errors.SqlglotError:
+        return None
+
 class SecureChatbot:
     def __init__(self):
+        # Schema cache, invalidated when PRAGMA schema_version changes
+        self._schema_lock = threading.Lock()
+        self._schema_cache = None
+        self._schema_text_cache = None
+        self._system_prompt_cache = None
+        self._schema_version = None
+        
+        # Groq prompt-cache statistics
+        self._usage_lock = threading.Lock()
+        self._prompt_tokens_total = 0
+        self._cached_tokens_total = 0
+        self._unmeasured_calls = 0
+        
+        # Generated SQL cache, cleared together with the schema cache
+        self._sql_cache_lock = threading.Lock()
+        self._sql_cache = OrderedDict()
+        
         self.init_database()
+        
+        # Build the schema caches once at startup instead of on the first request
+        with self._schema_lock:
+            self._rebuild_schema_cache()
+        
+        self.batcher = SQLBatcher(self)
     
     def init_database(self):
         """Initialize SQLite database with sample tables"""
@@ -48,8 +359,9 @@ class SecureChatbot:
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
         
-        # Create customers table
-        cursor.execute('''
+        # Tables and indexes submitted as one script
+        cursor.executescript('''
+            -- Customers table
             CREATE TABLE IF NOT EXISTS customers (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
@@ -59,11 +371,9 @@ class SecureChatbot:
                 country TEXT,
                 registration_date DATE,
                 status TEXT DEFAULT 'active'
-            )
-        ''')
-        
-        # Create orders table
-        cursor.execute('''
+            );
+            
+            -- Orders table
             CREATE TABLE IF NOT EXISTS orders (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 customer_id INTEGER,
@@ -73,11 +383,9 @@ class SecureChatbot:
                 order_date DATE,
                 status TEXT DEFAULT 'pending',
                 FOREIGN KEY (customer_id) REFERENCES customers (id)
-            )
-        ''')
-        
-        # Create products table
-        cursor.execute('''
+            );
+            
+            -- Products table
             CREATE TABLE IF NOT EXISTS products (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
@@ -86,12 +394,20 @@ class SecureChatbot:
                 stock_quantity INTEGER,
                 description TEXT,
                 created_date DATE
-            )
+            );
+            
+            -- Indexes for the columns generated queries filter and join on
+            CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
+            CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+            CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date);
+            CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+            CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status);
+            CREATE INDEX IF NOT EXISTS idx_customers_city ON customers(city);
         ''')
         
-        # Insert sample data if tables are empty
-        cursor.execute("SELECT COUNT(*) FROM customers")
-        if cursor.fetchone()[0] == 0:
+        # Insert sample data if tables are empty (stops at the first row instead of counting)
+        cursor.execute("SELECT 1 FROM customers LIMIT 1")
+        if cursor.fetchone() is None:
             self.insert_sample_data(cursor)
         
         conn.commit()
@@ -100,6 +416,9 @@ class SecureChatbot:
     
     def insert_sample_data(self, cursor):
         """Insert sample data for testing"""
+        # All sample inserts share one explicit transaction (a single commit)
+        cursor.execute('BEGIN')
+        
         # Sample customers
         customers_data = [
             ('John Smith', 'john.smith@email.com', '+1-555-0101', 'New York', 'USA', '2024-01-15', 'active'),
@@ -142,74 +461,131 @@ class SecureChatbot:
             orders_data
         )
         
+        cursor.execute('COMMIT')
         logger.info("Sample data inserted successfully")
     
     def get_database_schema(self):
-        """Get database schema information"""
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        """Get database schema information (cached until the schema version changes)"""
+        cursor = _get_conn().cursor()
+        cursor.execute("PRAGMA schema_version")
+        schema_version = cursor.fetchone()[0]
+        
+        with self._schema_lock:
+            if schema_version != self._schema_version:
+                self._rebuild_schema_cache()
+            return self._schema_cache
+    
+    def _rebuild_schema_cache(self):
+        """Re-read the schema and rebuild the prompt text derived from it (caller holds _schema_lock)"""
+        cursor = _get_conn().cursor()
+        cursor.execute("PRAGMA schema_version")
+        self._schema_version = cursor.fetchone()[0]
+        
+        self._schema_cache = self.read_schema(cursor)
+        self._schema_text_cache = self.format_schema_for_prompt(self._schema_cache)
+        self._system_prompt_cache = SYSTEM_PROMPT_TEMPLATE.format(schema_text=self._schema_text_cache)
+        
+        # Rough estimate (~4 characters per token); small schemas stay below the caching threshold
+        estimated_tokens = len(self._system_prompt_cache) // 4
+        if estimated_tokens < PROMPT_CACHE_MIN_TOKENS:
+            logger.info(f"System prompt is ~{estimated_tokens} tokens, below Groq's {PROMPT_CACHE_MIN_TOKENS}-token prompt caching threshold")
+        
+        # SQL generated against the old schema may no longer be valid
+        with self._sql_cache_lock:
+            self._sql_cache.clear()
+    
+    def get_system_prompt(self):
+        """Get the system prompt containing rules and schema (cached with the schema)"""
+        self.get_database_schema()
+        return self._system_prompt_cache
+    
+    def log_prompt_cache_usage(self, response):
+        """Log how many prompt tokens were served from Groq's prompt cache"""
+        usage = usage_field(response, 'usage')
+        prompt_tokens = usage_field(usage, 'prompt_tokens') or 0
+        details = usage_field(usage, 'prompt_tokens_details')
+        cached_tokens = usage_field(details, 'cached_tokens') or 0
+        
+        with self._usage_lock:
+            self._prompt_tokens_total += prompt_tokens
+            self._cached_tokens_total += cached_tokens
+            hit_rate = self._cached_tokens_total / self._prompt_tokens_total if self._prompt_tokens_total else 0.0
+        
+        logger.info(f"Prompt tokens: {prompt_tokens}, cached: {cached_tokens} (overall cache hit rate {hit_rate:.1%})")
+    
+    def log_usage_unavailable(self):
+        """Record a call whose usage was never reported (stream closed before its final chunk)"""
+        with self._usage_lock:
+            self._unmeasured_calls += 1
+            unmeasured_calls = self._unmeasured_calls
         
+        logger.info(f"Prompt usage not reported: stream closed early ({unmeasured_calls} unmeasured call(s), excluded from the hit rate)")
+    
+    def read_schema(self, cursor):
+        """Read table and column information from the database"""
         schema_info = {}
         
-        # Get all tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            
-            schema_info[table_name] = {
-                'columns': [
-                    {
-                        'name': col[1],
-                        'type': col[2],
-                        'not_null': bool(col[3]),
-                        'primary_key': bool(col[5])
-                    }
-                    for col in columns
-                ]
-            }
+        # All columns of all tables in one query, in table then column order
+        cursor.execute("""
+            SELECT m.name, p.name, p.type, p."notnull", p.pk
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+            ORDER BY m.rowid, p.cid
+        """)
+        
+        for table_name, column_name, column_type, not_null, primary_key in cursor.fetchall():
+            table_info = schema_info.setdefault(table_name, {'columns': []})
+            table_info['columns'].append({
+                'name': column_name,
+                'type': column_type,
+                'not_null': bool(not_null),
+                'primary_key': bool(primary_key)
+            })
         
-        conn.close()
         return schema_info
     
     def validate_sql_query(self, query):
         """Validate SQL query for security"""
-        query = query.strip().upper()
+        statements = parse_sql(query.strip())
+        if statements is None:
+            return False, "Query could not be parsed"
         
-        # Only allow SELECT statements
-        if not query.startswith('SELECT'):
-            return False, "Only SELECT queries are allowed for security reasons"
+        if len(statements) != 1:
+            return False, "Only a single SQL statement is allowed"
         
-        # Check for dangerous keywords
-        dangerous_keywords = [
-            'DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE',
-            'EXEC', 'EXECUTE', 'TRUNCATE', 'REPLACE', 'MERGE'
-        ]
+        # Only allow SELECT statements (including UNION of SELECTs)
+        tree = statements[0]
+        if not isinstance(tree, (exp.Select, exp.SetOperation)):
+            return False, "Only SELECT queries are allowed for security reasons"
         
-        for keyword in dangerous_keywords:
-            if keyword in query:
-                return False, f"Query contains forbidden keyword: {keyword}"
+        # Check for dangerous statements nested anywhere in the tree
+        for node in tree.walk():
+            if isinstance(node, FORBIDDEN_NODES):
+                return False, f"Query contains forbidden statement: {node.key.upper()}"
         
         return True, "Query is valid"
     
     def execute_query(self, sql_query):
         """Execute SQL query safely"""
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            cursor = _get_conn().cursor()
+            cursor.arraysize = RESULT_FETCH_SIZE
             
-            cursor.execute(sql_query)
-            results = cursor.fetchall()
+            cursor.execute(apply_row_limit(sql_query))
             
-            # Convert to list of dictionaries
-            data = [dict(row) for row in results]
+            # Columnar payload: column names once, rows as plain tuples
+            columns = [description[0] for description in cursor.description or ()]
+            rows = []
+            while len(rows) <= MAX_RESULT_ROWS and (chunk := cursor.fetchmany()):
+                rows.extend(chunk)
             
-            conn.close()
-            return True, data
+            # Queries with their own larger LIMIT are capped here as well
+            truncated = len(rows) > MAX_RESULT_ROWS
+            if truncated:
+                del rows[MAX_RESULT_ROWS:]
+            
+            return True, {'columns': columns, 'rows': rows, 'truncated': truncated}
         
         except Exception as e:
             logger.error(f"Query execution error: {str(e)}")
@@ -218,51 +594,124 @@ class SecureChatbot:
     def generate_sql_from_natural_language(self, user_question):
         """Generate SQL query from natural language using Groq"""
         try:
-            schema_info = self.get_database_schema()
-            schema_text = self.format_schema_for_prompt(schema_info)
+            # Refresh the schema caches first so SQL cached for an old schema is dropped
+            self.get_database_schema()
             
-            prompt = f"""
-You are a SQL expert. Convert the following natural language question to a SQL SELECT query.
-
-Database Schema:
-{schema_text}
-
-Important Rules:
-1. ONLY generate SELECT statements
-2. Use proper SQL syntax for SQLite
-3. Return ONLY the SQL query, no explanations
-4. Use appropriate JOINs when needed
-5. Handle aggregations correctly
-
-User Question: {user_question}
-
-SQL Query:"""
-
-            response = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=500
-            )
+            cache_key = normalize_question(user_question)
+            
+            # Answer common questions from templates
+            template_sql = match_sql_template(cache_key)
+            if template_sql is not None:
+                logger.info(f"SQL template match for: {cache_key}")
+                return template_sql
             
-            sql_query = response.choices[0].message.content.strip()
+            # Serve repeated questions without calling the LLM
+            with self._sql_cache_lock:
+                cached_sql = self._sql_cache.get(cache_key)
+                if cached_sql is not None:
+                    self._sql_cache.move_to_end(cache_key)
+                    logger.info(f"SQL cache hit for: {cache_key}")
+                    return cached_sql
             
-            # Clean up the response
-            sql_query = re.sub(r'^```sql\n?', '', sql_query)
-            sql_query = re.sub(r'\n?```$', '', sql_query)
-            sql_query = sql_query.strip()
+            # Coalesced with concurrent requests by the batcher
+            future = self.batcher.submit(user_question)
+            try:
+                sql_query = future.result(timeout=BATCH_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                # The call keeps running; cache its SQL when it lands so asking again is instant
+                future.add_done_callback(lambda done: self._cache_late_sql(cache_key, done))
+                logger.error(f"Timed out after {BATCH_TIMEOUT_SECONDS}s waiting for SQL for: {cache_key}")
+                return None
             
+            self._store_sql(cache_key, sql_query)
             return sql_query
         
         except Exception as e:
             logger.error(f"Groq API error: {str(e)}")
             return None
     
+    def _store_sql(self, cache_key, sql_query):
+        """Add generated SQL to the LRU cache, only if it will pass validation"""
+        if not self.validate_sql_query(sql_query)[0]:
+            return
+        with self._sql_cache_lock:
+            self._sql_cache[cache_key] = sql_query
+            self._sql_cache.move_to_end(cache_key)
+            if len(self._sql_cache) > SQL_CACHE_SIZE:
+                self._sql_cache.popitem(last=False)
+    
+    def _cache_late_sql(self, cache_key, future):
+        """Done-callback for a request whose caller stopped waiting"""
+        if future.exception() is None:
+            self._store_sql(cache_key, future.result())
+            logger.info(f"Cached late SQL for: {cache_key}")
+    
+    def request_sql(self, user_question):
+        """Ask Groq for the SQL of a single question, stopping once a complete query has streamed"""
+        stream = groq_client.chat.completions.create(
+            model="llama3-70b-8192",
+            messages=[
+                {"role": "system", "content": self.get_system_prompt()},
+                {"role": "user", "content": user_question}
+            ],
+            temperature=0.1,
+            max_tokens=500,
+            stream=True
+        )
+        
+        buffer = []
+        usage_logged = False
+        try:
+            for chunk in stream:
+                # Groq reports usage on the final chunk only, in the untyped x_groq extra (a dict)
+                x_groq = usage_field(chunk, 'x_groq')
+                if usage_field(x_groq, 'usage') is not None:
+                    self.log_prompt_cache_usage(x_groq)
+                    usage_logged = True
+                
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content or ''
+                buffer.append(content)
+                
+                # Stop as soon as the text up to the last ';' is a valid query
+                if ';' in content:
+                    text = ''.join(buffer)
+                    sql_query = clean_sql_response(text[:text.rindex(';') + 1])
+                    if self.validate_sql_query(sql_query)[0]:
+                        return sql_query
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+            # Draining the rest of the stream just for usage would defeat the early stop,
+            # so cut-off calls are counted as unmeasured instead of skewing the hit rate
+            if not usage_logged:
+                self.log_usage_unavailable()
+        
+        return clean_sql_response(''.join(buffer))
+    
+    def request_sql_batch(self, user_questions):
+        """Ask Groq for the SQL of several questions in one numbered prompt"""
+        numbered = '\n'.join(f"{number}. {question}" for number, question in enumerate(user_questions, 1))
+        response = groq_client.chat.completions.create(
+            model="llama3-70b-8192",
+            messages=[
+                {"role": "system", "content": self.get_system_prompt()},
+                {"role": "user", "content": BATCH_PROMPT_PREFIX.format(count=len(user_questions)) + numbered}
+            ],
+            temperature=0.1,
+            max_tokens=500 * len(user_questions)
+        )
+        self.log_prompt_cache_usage(response)
+        
+        return parse_numbered_replies(response.choices[0].message.content, len(user_questions))
+    
     def format_schema_for_prompt(self, schema_info):
-        """Format schema information for AI prompt"""
-        schema_text = ""
+        """Format schema information for AI prompt (pure function of schema_info)"""
+        parts = []
         for table_name, table_info in schema_info.items():
-            schema_text += f"\nTable: {table_name}\n"
+            parts.append(f"\nTable: {table_name}")
             for column in table_info['columns']:
                 constraints = []
                 if column['primary_key']:
@@ -271,13 +720,31 @@ SQL Query:"""
                     constraints.append('NOT NULL')
                 
                 constraint_text = f" ({', '.join(constraints)})" if constraints else ""
-                schema_text += f"  - {column['name']}: {column['type']}{constraint_text}\n"
+                parts.append(f"  - {column['name']}: {column['type']}{constraint_text}")
         
-        return schema_text
+        return "\n".join(parts) + "\n"
 
 # Initialize chatbot
 chatbot = SecureChatbot()
 
+# Formatted timestamp of the current second, shared by all requests within it
+_iso_second_cache = {'entry': (None, '')}
+
+def fast_iso_now():
+    """UTC ISO-8601 timestamp, running strftime at most once per second"""
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _iso_second_cache['entry']
+    if cached_second != second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        # Stored as one tuple so concurrent readers never see a mismatched pair
+        _iso_second_cache['entry'] = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1e6):06d}Z"
+
+def fast_json(obj, status=200):
+    """Return obj as an orjson-encoded JSON response, writing result row tuples as arrays"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
 @app.route('/')
 def index():
     """Main chat interface"""
@@ -288,15 +755,15 @@ def get_schema():
     """API endpoint to get database schema"""
     try:
         schema = chatbot.get_database_schema()
-        return jsonify({
+        return fast_json({
             'success': True,
             'schema': schema
         })
     except Exception as e:
-        return jsonify({
+        return fast_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -306,16 +773,16 @@ def chat():
         user_message = data.get('message', '').strip()
         
         if not user_message:
-            return jsonify({
+            return fast_json({
                 'success': False,
                 'error': 'Message cannot be empty'
-            }), 400
+            }, 400)
         
         # Generate SQL query from natural language
         sql_query = chatbot.generate_sql_from_natural_language(user_message)
         
         if not sql_query:
-            return jsonify({
+            return fast_json({
                 'success': False,
                 'error': 'Failed to generate SQL query. Please try rephrasing your question.'
             })
@@ -324,7 +791,7 @@ def chat():
         is_valid, validation_message = chatbot.validate_sql_query(sql_query)
         
         if not is_valid:
-            return jsonify({
+            return fast_json({
                 'success': False,
                 'error': validation_message,
                 'generated_sql': sql_query
@@ -334,32 +801,43 @@ def chat():
         success, results = chatbot.execute_query(sql_query)
         
         if not success:
-            return jsonify({
+            return fast_json({
                 'success': False,
                 'error': results,
                 'generated_sql': sql_query
             })
         
         # Format response
+        message = f"Found {len(results['rows'])} result(s)"
+        if results['truncated']:
+            message += f" (limited to the first {MAX_RESULT_ROWS})"
+        
         response_data = {
             'success': True,
-            'message': f"Found {len(results)} result(s)",
+            'message': message,
             'generated_sql': sql_query,
             'results': results,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': fast_iso_now()
         }
         
         logger.info(f"Query executed successfully: {sql_query}")
-        return jsonify(response_data)
+        return fast_json(response_data)
     
     except Exception as e:
         logger.error(f"Chat endpoint error: {str(e)}")
-        return jsonify({
+        return fast_json({
             'success': False,
             'error': f'Server error: {str(e)}'
-        }), 500
+        }, 500)
 
 if __name__ == '__main__':
     os.makedirs('logs', exist_ok=True)
     logger.info("Starting Secure SQL Chatbot application")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    
+    if os.getenv('FLASK_ENV') == 'development':
+        # Reloader + debugger, single process: local development only
+        app.run(debug=True, host='0.0.0.0', port=5000)
+    else:
+        # Threaded WSGI server so chat requests waiting on Groq run in parallel
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=5000, threads=8)
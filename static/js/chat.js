@@ -175,7 +175,7 @@ class SecureChatbot {
                     <i class="fas fa-check-circle text-success me-2"></i>
                     <strong>${data.message}</strong>
                 </div>
-                ${data.results && data.results.length > 0 ? this.formatResults(data.results) : '<p class="mb-0 text-muted">No results found.</p>'}
+                ${this.formatResults(data.results)}
             `;
         } else {
             bubbleClass += ' error-message';
@@ -214,14 +214,15 @@ class SecureChatbot {
     }
     
     formatResults(results) {
-        if (!results || results.length === 0) {
+        if (!results || !results.rows || results.rows.length === 0) {
             return '<p class="text-muted mb-0">No results found.</p>';
         }
         
-        const columns = Object.keys(results[0]);
+        const columns = results.columns;
+        const rows = results.rows;
         const maxRows = 10; // Limit display to prevent overwhelming UI
-        const displayResults = results.slice(0, maxRows);
-        const hasMore = results.length > maxRows;
+        const displayResults = rows.slice(0, maxRows);
+        const hasMore = rows.length > maxRows;
         
         let tableHtml = `
             <div class="results-table-container">
@@ -236,8 +237,8 @@ class SecureChatbot {
         
         displayResults.forEach(row => {
             tableHtml += '<tr>';
-            columns.forEach(col => {
-                let value = row[col];
+            row.forEach(cell => {
+                let value = cell;
                 if (value === null || value === undefined) {
                     value = '<span class="text-muted">null</span>';
                 } else if (typeof value === 'number') {
@@ -261,7 +262,7 @@ class SecureChatbot {
                 <div class="mt-2">
                     <small class="text-muted">
                         <i class="fas fa-info-circle me-1"></i>
-                        Showing first ${maxRows} of ${results.length} results
+                        Showing first ${maxRows} of ${rows.length} results
                     </small>
                 </div>
             `;
@@ -39,7 +39,7 @@ def test_chatbot():
                 print(f"Generated SQL: {sql}")
                 success, results = chatbot.execute_query(sql)
                 if success:
-                    print(f"✅ Query executed successfully: {len(results)} results")
+                    print(f"✅ Query executed successfully: {len(results['rows'])} results")
                 else:
                     print(f"❌ Query failed: {results}")
             else:
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Quick test of main.py's reply parsing and row limit helpers
+"""
+
+import sys
+import os
+
+# Add the project directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import parse_numbered_replies, apply_row_limit, MAX_RESULT_ROWS
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✅ {label}")
+    else:
+        print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+
+def test_parse_numbered_replies():
+    print("=== Testing numbered batch replies ===")
+
+    expected = ["SELECT a FROM t;", "SELECT b FROM t;"]
+    check("Unfenced reply",
+          parse_numbered_replies("1. SELECT a FROM t;\n2. SELECT b FROM t;", 2), expected)
+    check("Reply wrapped in one fence",
+          parse_numbered_replies("```sql\n1. SELECT a FROM t;\n2. SELECT b FROM t;\n```", 2), expected)
+    check("Each query fenced",
+          parse_numbered_replies("1. ```sql\nSELECT a FROM t;\n```\n2. ```sql\nSELECT b FROM t;\n```", 2), expected)
+    check("Single fenced reply",
+          parse_numbered_replies("```sql\n1. SELECT a FROM t;\n```", 1), ["SELECT a FROM t;"])
+    check("Multi-line queries",
+          parse_numbered_replies("```\n1. SELECT a\nFROM t;\n2. SELECT b\nFROM t;\n```", 2),
+          ["SELECT a\nFROM t;", "SELECT b\nFROM t;"])
+    check("Missing reply",
+          parse_numbered_replies("1. SELECT a FROM t;", 2), ["SELECT a FROM t;", None])
+
+def test_apply_row_limit():
+    print("\n=== Testing row limits ===")
+
+    limit = f"LIMIT {MAX_RESULT_ROWS + 1}"
+    check("Plain query",
+          apply_row_limit("SELECT * FROM customers"), f"SELECT * FROM customers {limit}")
+    check("Trailing semicolon",
+          apply_row_limit("SELECT * FROM customers;"), f"SELECT * FROM customers {limit}")
+    check("Trailing line comment",
+          apply_row_limit("SELECT * FROM customers -- every customer"), f"SELECT * FROM customers {limit}")
+    check("Trailing block comment",
+          apply_row_limit("SELECT * FROM customers /* every customer */;"), f"SELECT * FROM customers {limit}")
+    check("LIMIT inside a quoted literal",
+          apply_row_limit("SELECT * FROM products WHERE name = 'a; LIMIT 5'"),
+          f"SELECT * FROM products WHERE name = 'a; LIMIT 5' {limit}")
+    check("Quoted column label kept",
+          apply_row_limit('SELECT name AS "Customer Name" FROM customers'),
+          f'SELECT name AS "Customer Name" FROM customers {limit}')
+    check("UNION",
+          apply_row_limit("SELECT name FROM customers UNION SELECT name FROM employees"),
+          f"SELECT name FROM customers UNION SELECT name FROM employees {limit}")
+    check("UNION with its own LIMIT",
+          apply_row_limit("SELECT name FROM customers UNION SELECT name FROM employees LIMIT 3"),
+          "SELECT name FROM customers UNION SELECT name FROM employees LIMIT 3")
+    check("Existing LIMIT",
+          apply_row_limit("SELECT * FROM orders LIMIT 5"), "SELECT * FROM orders LIMIT 5")
+
+if __name__ == "__main__":
+    test_parse_numbered_replies()
+    test_apply_row_limit()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Quick test of how app.py reads SQL from a streamed Groq completion
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+# Add the project directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import read_sql_from_stream
+
+def fake_stream(text, chunk_size=5):
+    """Yield text in small chunks shaped like Groq stream events"""
+    for start in range(0, len(text), chunk_size):
+        delta = SimpleNamespace(content=text[start:start + chunk_size])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+def check(label, reply, expected):
+    actual = read_sql_from_stream(fake_stream(reply))
+    if actual == expected:
+        print(f"✅ {label}")
+    else:
+        print(f"❌ {label}: expected {expected!r}, got {actual!r}")
+
+def test_read_sql_from_stream():
+    print("=== Testing streamed SQL replies ===")
+
+    check("Unfenced statement",
+          "SELECT * FROM customers;", "SELECT * FROM customers;")
+    check("Stops after the statement",
+          "SELECT *\nFROM customers;\nThis lists every customer.", "SELECT *\nFROM customers;")
+    check("Fenced statement",
+          "```sql\nSELECT *\nFROM customers;\n```\nThis lists every customer.", "SELECT *\nFROM customers;")
+    check("Fence without a semicolon",
+          "```\nSELECT * FROM customers\n```", "SELECT * FROM customers")
+    check("Prose before a fence",
+          "Here is the query:\n```sql\nSELECT * FROM customers;\n```", "SELECT * FROM customers;")
+    check("Prose before an unfenced statement",
+          "Here is the query:\nSELECT * FROM customers;", "SELECT * FROM customers;")
+    check("Semicolon inside a literal",
+          "SELECT * FROM products WHERE name = 'a;\nb';", "SELECT * FROM products WHERE name = 'a;\nb';")
+    check("Prose only", "I cannot answer that.", "")
+
+if __name__ == "__main__":
+    test_read_sql_from_stream()